@@ -1,10 +1,17 @@
 import time
-import hashlib
 import os
+import io
+import random
+import cProfile
+import hmac
+import pstats
+import threading
 from collections import defaultdict
 from flask import Flask, request, jsonify, make_response
 from functools import wraps
 
+from entropy_mixer import Deadline, EntropyMixer, grid_source, os_random_source, timestamp_source
+
 app = Flask(__name__, static_folder="public", static_url_path="")
 
 # Definir grupos de caracteres directamente
@@ -19,6 +26,34 @@ class SimpleLogger:
 def get_logger():
     return SimpleLogger()
 
+def env_float(name, default, is_valid, hint):
+    """Lee un número de una variable de entorno; si es inválido usa el valor por defecto"""
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        value = None
+    if value is None or not is_valid(value):
+        get_logger().write(f"CONFIG {name}={raw!r} inválido ({hint}), se usa {default}")
+        return default
+    return value
+
+# Presupuesto de tiempo por request (segundos)
+REQUEST_DEADLINE = env_float(
+    "REQUEST_DEADLINE", 2.0, lambda value: 0 < value < float("inf"), "debe ser mayor que 0"
+)
+MIN_IMAGE_VALUES = 100
+MAX_IMAGE_VALUES = 5000
+IMAGE_CHUNK = 500
+
+def server_timing(budget):
+    """Formato del header Server-Timing (duraciones en milisegundos)"""
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in budget.stages.items()]
+    parts.append(f"total;dur={budget.elapsed() * 1000:.2f}")
+    return ", ".join(parts)
+
 # Rate limiting simple (en memoria)
 rate_limit_data = defaultdict(list)
 MAX_REQUESTS = 10  # máximo de requests
@@ -44,6 +79,69 @@ def rate_limit(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Perfilado por muestreo (desactivado si PROFILE_SAMPLE_RATE es 0).
+# Los perfiles se acumulan por proceso: con varios workers de gunicorn cada
+# volcado sólo contiene los del worker que atendió /api/profile/dump. Cada
+# volcado vacía el acumulado, así que los archivos (con el PID en el nombre) no
+# se solapan y pueden combinarse todos con pstats.Stats.add.
+PROFILE_SAMPLE_RATE = env_float(
+    "PROFILE_SAMPLE_RATE", 0.0, lambda value: 0 <= value <= 1, "debe estar entre 0 y 1"
+)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+profile_lock = threading.Lock()
+profile_data = {"stats": None, "samples": 0, "dumps": 0}
+
+def sample_profile(f):
+    """Perfila con cProfile una fracción de las llamadas y acumula las estadísticas"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+            return f(*args, **kwargs)
+        # cProfile no admite dos perfiles activos a la vez: si ya hay uno, no se muestrea
+        if not profile_lock.acquire(blocking=False):
+            return f(*args, **kwargs)
+        try:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                profiler.disable()
+                if profile_data["stats"] is None:
+                    profile_data["stats"] = pstats.Stats(profiler)
+                else:
+                    profile_data["stats"].add(profiler)
+                profile_data["samples"] += 1
+        finally:
+            profile_lock.release()
+    return decorated_function
+
+def dump_profile():
+    """Escribe el perfil acumulado en PROFILE_DIR (binario pstats + resumen .txt) y lo reinicia"""
+    with profile_lock:
+        stats = profile_data["stats"]
+        samples = profile_data["samples"]
+        if stats is None:
+            return None, 0
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_data["dumps"] += 1
+        name = (
+            f"api-password-{time.strftime('%Y%m%d-%H%M%S')}"
+            f"-pid{os.getpid()}-{profile_data['dumps']:04d}.prof"
+        )
+        path = os.path.join(PROFILE_DIR, name)
+        stats.dump_stats(path)
+        buffer = io.StringIO()
+        stats.stream = buffer
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(40)
+        with open(f"{path}.txt", "w", encoding="utf-8") as handle:
+            handle.write(f"# Requests muestreados: {samples} (pid {os.getpid()})\n\n")
+            handle.write(buffer.getvalue())
+        profile_data["stats"] = None
+        profile_data["samples"] = 0
+    return path, samples
+
 @app.after_request
 def add_security_headers(response):
     """Agregar headers de seguridad a todas las respuestas"""
@@ -82,15 +180,26 @@ def generator_page():
 def privacy_page():
     return app.send_static_file("privacy.html")
 
+@app.route("/api/profile/dump", methods=["POST"])
+def api_profile_dump():
+    """Vuelca el perfil acumulado; sólo disponible si PROFILE_TOKEN está configurado"""
+    if not PROFILE_TOKEN:
+        return jsonify({"error": "No encontrado"}), 404
+    if not hmac.compare_digest(request.headers.get("X-Profile-Token", ""), PROFILE_TOKEN):
+        return jsonify({"error": "No autorizado"}), 403
+    path, samples = dump_profile()
+    if path is None:
+        return jsonify({"error": "Aún no hay requests perfilados"}), 404
+    return jsonify({"path": path, "samples": samples, "pid": os.getpid()})
+
 @app.route("/api/password", methods=["POST"])
 @rate_limit
+@sample_profile
 def api_password():
     """Nuevo endpoint que recibe datos de imagen desde el navegador"""
-    import hashlib
-    import random
-    import os
-    
+    budget = Deadline(REQUEST_DEADLINE)
     try:
+        stage_start = time.monotonic()
         data = request.get_json()
         
         if not data:
@@ -99,28 +208,57 @@ def api_password():
         length = data.get("length", 16)
         image_data = data.get("imageData", [])  # Array de píxeles RGB
         
+        # El cliente puede pedir un presupuesto menor, nunca mayor que el del servidor
+        requested_deadline = data.get("deadline")
+        if requested_deadline is not None:
+            valid = isinstance(requested_deadline, (int, float)) and not isinstance(requested_deadline, bool)
+            if not valid or requested_deadline <= 0:
+                return jsonify({"error": "El deadline debe ser un número positivo"}), 400
+            budget.budget = min(budget.budget, float(requested_deadline))
+        
         # Validación
         if not isinstance(length, int) or length < 4 or length > 30:
             return jsonify({"error": "La longitud debe estar entre 4 y 30"}), 400
         
-        if not image_data or len(image_data) < 100:
+        if not image_data or len(image_data) < MIN_IMAGE_VALUES:
             return jsonify({"error": "Datos de imagen insuficientes"}), 400
+        budget.mark("parse", stage_start)
         
         # Construir entrada para el hash usando los datos de la imagen
+        stage_start = time.monotonic()
         digest_input = bytearray()
         
-        # Agregar datos de píxeles
-        for pixel_value in image_data[:5000]:  # Limitar a 5000 valores
-            digest_input.append(int(pixel_value) & 0xFF)
+        # Agregar datos de píxeles por bloques; si se agota el presupuesto se usan
+        # menos valores (siempre al menos el mínimo exigido)
+        pixels = image_data[:MAX_IMAGE_VALUES]
+        used_values = 0
+        for offset in range(0, len(pixels), IMAGE_CHUNK):
+            if used_values >= MIN_IMAGE_VALUES and budget.expired():
+                break
+            for pixel_value in pixels[offset:offset + IMAGE_CHUNK]:
+                digest_input.append(int(pixel_value) & 0xFF)
+            used_values = min(len(pixels), offset + IMAGE_CHUNK)
+        budget.mark("pixels", stage_start)
         
-        # Agregar timestamp
-        digest_input.extend(int(time.time() * 1000000).to_bytes(8, "little"))
+        stage_start = time.monotonic()
+        # Mezclar imagen, timestamp y entropía del sistema en un único SHA-512
+        mixer = EntropyMixer(
+            [
+                grid_source(digest_input, name="image", required=True),
+                timestamp_source(required=True),
+                os_random_source(32),
+            ],
+            min_sources=3,
+        )
+        # Las tres fuentes están en memoria: se mezclan en el hilo del request,
+        # sin pool, así que esta etapa no puede bloquearse esperando workers.
+        mixed = mixer.mix_inline()
+        if not mixed.sufficient:
+            raise RuntimeError(f"Mezcla incompleta: {mixed.summary()}")
+        digest = mixed.digest
+        budget.mark("mix", stage_start)
         
-        # Agregar entropía adicional del sistema
-        digest_input.extend(os.urandom(32))
-        
-        # Generar hash SHA-512
-        digest = hashlib.sha512(digest_input).digest()
+        stage_start = time.monotonic()
         
         # Construir conjunto de caracteres
         charset = ""
@@ -159,14 +297,23 @@ def api_password():
             password_chars[i], password_chars[j] = password_chars[j], password_chars[i]
         
         password = "".join(password_chars[:length])
+        budget.mark("build", stage_start)
         
         logger = get_logger()
-        logger.write(f"PASSWORD generated successfully, length={length}, image_data_points={len(image_data)}")
+        logger.write(
+            f"PASSWORD generated successfully, length={length}, image_data_points={len(image_data)}, "
+            f"used_points={used_values}, timing={server_timing(budget)}, mixer={mixed.summary()}"
+        )
         
-        return jsonify({
+        # Indicar al cliente si el presupuesto obligó a usar menos valores de imagen
+        response = jsonify({
             "password": password,
-            "length": len(password)
+            "length": len(password),
+            "usedValues": used_values,
+            "truncated": used_values < len(pixels)
         })
+        response.headers["Server-Timing"] = server_timing(budget)
+        return response
         
     except Exception as exc:
         logger = get_logger()
@@ -0,0 +1,328 @@
+"""Mezclador concurrente de varias fuentes de entropía.
+
+Cada fuente se ejecuta en un pool de hilos y su resultado se incorpora a un
+único estado SHA-512 en cuanto termina, sin esperar a las más lentas. La mezcla
+se detiene apenas se reúne un conjunto suficiente de fuentes.
+
+``Deadline`` es el presupuesto de tiempo compartido por la CLI y el servidor.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+
+class DeadlineExceeded(RuntimeError):
+    """Señala que se agotó el presupuesto de tiempo antes de obtener datos."""
+
+
+class Deadline:
+    """Presupuesto de tiempo total compartido por todas las etapas de una ejecución."""
+
+    def __init__(self, budget: Optional[float] = None) -> None:
+        self.budget = budget if budget is None else max(0.0, budget)
+        self.started = time.monotonic()
+        self.stages: Dict[str, float] = {}
+
+    def start(self) -> None:
+        """Reinicia el reloj, p. ej. tras las preguntas interactivas al usuario."""
+
+        self.started = time.monotonic()
+        self.stages.clear()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        if self.budget is None:
+            return math.inf
+        return max(0.0, self.budget - self.elapsed())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def clamp(self, seconds: float) -> float:
+        """Recorta una espera para que no supere el tiempo restante."""
+
+        return max(0.0, min(seconds, self.remaining()))
+
+    def mark(self, name: str, start: float) -> None:
+        """Suma a la etapa ``name`` el tiempo transcurrido desde ``start``."""
+
+        self.stages[name] = self.stages.get(name, 0.0) + (time.monotonic() - start)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.mark(name, start)
+
+    def report(self) -> str:
+        parts = [f"{name}={seconds:.3f}s" for name, seconds in self.stages.items()]
+        parts.append(f"total={self.elapsed():.3f}s")
+        if self.budget is not None:
+            parts.append(f"budget={self.budget:.3f}s")
+        return " ".join(parts)
+
+
+@dataclass
+class EntropySource:
+    """Fuente de entropía: ``fetch`` devuelve los bytes a mezclar.
+
+    Con ``inline`` la fuente se ejecuta en el hilo que llama a ``mix()``
+    mientras las demás corren en el pool (p. ej. si abre ventanas de OpenCV).
+    """
+
+    name: str
+    fetch: Callable[[], bytes]
+    required: bool = False
+    inline: bool = False
+
+
+@dataclass
+class SourceStats:
+    """Resultado de una fuente; ``latency`` es siempre el tiempo que estuvo
+    ejecutándose ``fetch`` (hasta que terminó, falló o fue omitida)."""
+
+    name: str
+    ok: bool
+    latency: float
+    contributed: int = 0
+    order: Optional[int] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class MixResult:
+    digest: bytes
+    sufficient: bool
+    elapsed: float
+    stats: List[SourceStats] = field(default_factory=list)
+
+    def summary(self) -> str:
+        parts = []
+        for stat in self.stats:
+            if stat.ok:
+                parts.append(f"{stat.name}:{stat.contributed}B/{stat.latency * 1000:.1f}ms")
+            else:
+                parts.append(f"{stat.name}:{stat.error}/{stat.latency * 1000:.1f}ms")
+        return f"sufficient={self.sufficient} elapsed={self.elapsed * 1000:.1f}ms " + " ".join(parts)
+
+
+def os_random_source(size: int = 32, *, required: bool = True) -> EntropySource:
+    return EntropySource(name="os", fetch=lambda: os.urandom(size), required=required)
+
+
+def timestamp_source(*, required: bool = False) -> EntropySource:
+    return EntropySource(
+        name="timestamp",
+        fetch=lambda: time.time_ns().to_bytes(8, "little"),
+        required=required,
+    )
+
+
+def grid_source(values: Iterable[int], *, name: str = "grid", required: bool = False) -> EntropySource:
+    """Fuente a partir de valores de una cuadrícula (p. ej. subidos por el cliente)."""
+
+    data = bytes(int(value) & 0xFF for value in values)
+    return EntropySource(name=name, fetch=lambda: data, required=required)
+
+
+def file_source(path: str, *, required: bool = False) -> EntropySource:
+    """Reproduce un archivo: un respaldo JSON de frames o bytes crudos."""
+
+    def fetch() -> bytes:
+        with open(path, "rb") as handle:
+            raw = handle.read()
+        if path.lower().endswith(".json"):
+            try:
+                payload = json.loads(raw.decode("utf-8"))
+            except (UnicodeDecodeError, ValueError):
+                return raw
+            frames = payload.get("frames") if isinstance(payload, dict) else None
+            if isinstance(frames, list):
+                out = bytearray()
+                for frame in frames:
+                    out.extend(int(value) & 0xFF for value in frame.get("flat", []))
+                return bytes(out)
+        return raw
+
+    return EntropySource(name=f"file:{os.path.basename(path)}", fetch=fetch, required=required)
+
+
+def _timed(source: EntropySource, started_at: Dict[int, float], position: int):
+    """Ejecuta ``fetch`` y devuelve ``(datos, duración, error)`` sin propagar excepciones."""
+
+    start = started_at[position] = time.monotonic()
+    try:
+        data = bytes(source.fetch())
+    except Exception as exc:
+        return None, time.monotonic() - start, f"{type(exc).__name__}: {exc}"
+    return data, time.monotonic() - start, None
+
+
+class EntropyMixer:
+    """Mezcla varias fuentes de entropía en un único SHA-512.
+
+    Las fuentes omitidas se dejan de esperar pero no se interrumpen: un hilo
+    del pool que sigue leyendo una cámara continúa hasta terminar, y el
+    intérprete lo espera al salir, por lo que puede retrasar el fin del proceso.
+    """
+
+    def __init__(
+        self,
+        sources: Sequence[EntropySource],
+        *,
+        min_sources: int = 1,
+        min_bytes: int = 0,
+        executor: Optional[Executor] = None,
+        max_workers: Optional[int] = None,
+        logger: Any = None,
+    ) -> None:
+        if not sources:
+            raise ValueError("Se necesita al menos una fuente de entropía")
+        self.sources = list(sources)
+        self.min_sources = max(1, min_sources)
+        self.min_bytes = max(0, min_bytes)
+        self.executor = executor
+        self.max_workers = max_workers or len(self.sources)
+        self.logger = logger
+
+    def _sufficient(self, stats: Dict[int, SourceStats]) -> bool:
+        for position, source in enumerate(self.sources):
+            if source.required and not (position in stats and stats[position].ok):
+                return False
+        ok = [stat for stat in stats.values() if stat.ok]
+        return (
+            len(ok) >= self.min_sources
+            and sum(stat.contributed for stat in ok) >= self.min_bytes
+        )
+
+    def _required_failed(self, stats: Dict[int, SourceStats]) -> bool:
+        """Una fuente obligatoria falló: la mezcla ya no puede ser suficiente."""
+
+        return any(
+            self.sources[position].required and not stat.ok for position, stat in stats.items()
+        )
+
+    def _done(self, stats: Dict[int, SourceStats]) -> bool:
+        return self._sufficient(stats) or self._required_failed(stats)
+
+    def _record(
+        self,
+        hasher,
+        stats: Dict[int, SourceStats],
+        position: int,
+        data: Optional[bytes],
+        latency: float,
+        error: Optional[str],
+    ) -> None:
+        source = self.sources[position]
+        if data is None:
+            stats[position] = SourceStats(name=source.name, ok=False, latency=latency, error=error)
+            return
+        # Incorporar la fuente al estado en cuanto termina, con prefijos de
+        # longitud para que la mezcla no sea ambigua.
+        name = source.name.encode("utf-8")
+        hasher.update(len(name).to_bytes(2, "little") + name)
+        hasher.update(len(data).to_bytes(4, "little") + data)
+        stats[position] = SourceStats(
+            name=source.name,
+            ok=True,
+            latency=latency,
+            contributed=len(data),
+            order=sum(1 for stat in stats.values() if stat.ok),
+        )
+
+    def _omit(
+        self, stats: Dict[int, SourceStats], position: int, started_at: Dict[int, float]
+    ) -> None:
+        now = time.monotonic()
+        stats[position] = SourceStats(
+            name=self.sources[position].name,
+            ok=False,
+            latency=now - started_at.get(position, now),
+            error="omitida",
+        )
+
+    def _finish(self, hasher, stats: Dict[int, SourceStats], started: float) -> MixResult:
+        result = MixResult(
+            digest=hasher.digest(),
+            sufficient=self._sufficient(stats),
+            elapsed=time.monotonic() - started,
+            stats=[stats[position] for position in sorted(stats)],
+        )
+        if self.logger is not None:
+            self.logger.write(f"MIXER {result.summary()}")
+        return result
+
+    def mix(self, deadline: Optional[Deadline] = None) -> MixResult:
+        """Mezcla las fuentes a medida que terminan, sin superar ``deadline``."""
+
+        started = time.monotonic()
+        owns_executor = self.executor is None
+        executor = self.executor or ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="entropy-mixer"
+        )
+        hasher = hashlib.sha512()
+        stats: Dict[int, SourceStats] = {}
+        started_at: Dict[int, float] = {}
+        futures: Dict[Future, int] = {}
+        try:
+            for position, source in enumerate(self.sources):
+                if not source.inline:
+                    futures[executor.submit(_timed, source, started_at, position)] = position
+            pending = set(futures)
+
+            for position, source in enumerate(self.sources):
+                if source.inline:
+                    self._record(hasher, stats, position, *_timed(source, started_at, position))
+
+            while pending and not self._done(stats):
+                timeout = None if deadline is None else max(0.0, deadline.remaining())
+                if timeout == math.inf:
+                    timeout = None
+                # Con el tiempo agotado aún se recogen las fuentes ya terminadas.
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done and timeout is not None:
+                    break
+                for future in done:
+                    self._record(hasher, stats, futures[future], *future.result())
+
+            for future in pending:
+                future.cancel()
+                self._omit(stats, futures[future], started_at)
+        finally:
+            if owns_executor:
+                # No espera a los hilos en curso: ver la nota de la clase.
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        return self._finish(hasher, stats, started)
+
+    def mix_inline(self, deadline: Optional[Deadline] = None) -> MixResult:
+        """Mezcla las fuentes una tras otra en el hilo actual.
+
+        Pensado para fuentes que ya están en memoria, donde pasar por un pool
+        sólo añade coste.
+        """
+
+        started = time.monotonic()
+        hasher = hashlib.sha512()
+        stats: Dict[int, SourceStats] = {}
+        started_at: Dict[int, float] = {}
+        for position, source in enumerate(self.sources):
+            if self._done(stats) or (deadline is not None and deadline.expired()):
+                self._omit(stats, position, started_at)
+                continue
+            self._record(hasher, stats, position, *_timed(source, started_at, position))
+        return self._finish(hasher, stats, started)
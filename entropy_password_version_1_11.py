@@ -3,15 +3,18 @@
 from __future__ import annotations
 
 import argparse
+import cProfile
 import hashlib
+import io
 import json
 import os
+import pstats
 import random
 import string
 import sys
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 import math
 import threading
 
@@ -19,6 +22,15 @@ import threading
 import numpy as np
 import cv2
 
+from entropy_mixer import (
+    Deadline,
+    DeadlineExceeded,
+    EntropyMixer,
+    EntropySource,
+    file_source,
+    os_random_source,
+)
+
 
 class CameraOpenError(RuntimeError):
     """Señala fallos al inicializar la cámara."""
@@ -56,14 +68,25 @@ class CameraOpener:
         retries: int = 5,
         delay: float = 0.5,
         diag: bool = False,
+        deadline: Optional[Deadline] = None,
+        exclude: Sequence[int] = (),
     ):
+        deadline = deadline or Deadline()
         indices: List[int] = [preferred_index]
         if try_all:
-            indices.extend([i for i in range(max_index + 1) if i != preferred_index])
+            indices.extend(
+                [i for i in range(max_index + 1) if i != preferred_index and i not in exclude]
+            )
 
         last_error: Optional[str] = None
         for index in indices:
             for attempt in range(1, max(1, retries) + 1):
+                if deadline.expired():
+                    self.logger.write(f"CAMERA open-deadline index={index} attempt={attempt}")
+                    raise DeadlineExceeded(
+                        "Se agotó el tiempo disponible para abrir la cámara"
+                        + (f" (último intento: {last_error})" if last_error else "")
+                    )
                 cap = cv2.VideoCapture(index, cv2.CAP_ANY)
                 if cap is not None and cap.isOpened():
                     backend = -1.0
@@ -80,16 +103,22 @@ class CameraOpener:
                 if diag:
                     print(f"[entropy-1.11][diag] Falló la cámara {last_error}")
                 if delay > 0:
-                    time.sleep(delay)
+                    time.sleep(deadline.clamp(delay))
 
         error_msg = "No se pudo abrir ninguna cámara disponible"
         if last_error:
             error_msg += f" (último intento: {last_error})"
         raise CameraOpenError(error_msg)
 
-    def read_frame(self, cap, *, timeout: float):
-        deadline = time.time() + max(0.1, timeout)
-        while time.time() <= deadline:
+    def read_frame(self, cap, *, timeout: float, deadline: Optional[Deadline] = None):
+        if deadline is not None:
+            if deadline.expired():
+                return False, None
+            timeout = min(max(0.1, timeout), deadline.remaining())
+        else:
+            timeout = max(0.1, timeout)
+        limit = time.time() + timeout
+        while time.time() <= limit:
             ok, frame = cap.read()
             if ok and frame is not None:
                 return True, frame
@@ -180,6 +209,7 @@ def generate_password(
     allowed_groups: Sequence[str],
     required_groups: Optional[Sequence[str]] = None,
     extra_chars: str = "",
+    extra_entropy: bytes = b"",
 ) -> str:
     if not (10 <= length <= 30):
         raise ValueError("La longitud debe estar entre 10 y 30")
@@ -200,6 +230,7 @@ def generate_password(
         digest_input.extend(int(frame.grid_shape[1]).to_bytes(1, "little"))
         brightness_int = max(0, min(65535, int(frame.avg_brightness * 10)))
         digest_input.extend(brightness_int.to_bytes(2, "little"))
+    digest_input.extend(extra_entropy)
     digest_input.extend(os.urandom(16))
 
     digest = hashlib.sha512(digest_input).digest()
@@ -236,9 +267,12 @@ def capture_frames(
     grid_min: int,
     grid_max: int,
     open_kwargs: Optional[Dict[str, object]] = None,
+    deadline: Optional[Deadline] = None,
 ) -> List[FrameData]:
     open_kwargs = open_kwargs or {}
-    cap, index, backend = opener.open_camera(**open_kwargs)
+    deadline = deadline or Deadline()
+    with deadline.stage("open"):
+        cap, index, backend = opener.open_camera(deadline=deadline, **open_kwargs)
     opener.logger.write(f"SESSION camera-opened index={index} backend={backend}")
     collected: List[FrameData] = []
     cv2 = opener.cv2
@@ -249,36 +283,61 @@ def capture_frames(
     if preview and cv2 is not None:
         cv2.namedWindow(window, cv2.WINDOW_NORMAL)
 
+    frame_cost = 0.0
     try:
         for i in range(frames):
-            ok, frame = opener.read_frame(cap, timeout=timeout)
+            if collected and deadline.expired():
+                opener.logger.write(f"DEADLINE capture-stopped frames={len(collected)}/{frames}")
+                print(
+                    f"[entropy-1.11] Tiempo agotado: se usarán {len(collected)} de {frames} frame(s)."
+                )
+                break
+            # Si el tiempo restante no alcanza para todos los frames pendientes, usar
+            # la cuadrícula mínima y omitir la superposición del preview para abaratar
+            # cada frame (la ventana se sigue refrescando para que 'q' funcione).
+            tight = deadline.remaining() < frame_cost * (frames - i)
+
+            frame_start = time.monotonic()
+            with deadline.stage("read"):
+                ok, frame = opener.read_frame(cap, timeout=timeout, deadline=deadline)
             if not ok or frame is None:
+                if collected and deadline.expired():
+                    break
+                if deadline.expired():
+                    raise DeadlineExceeded("Se agotó el tiempo antes de leer un frame de la cámara")
                 raise RuntimeError("No se pudo leer un frame de la cámara real")
 
-            grid_rows = random.randint(grid_min, grid_max)
-            grid_cols = random.randint(grid_min, grid_max)
+            if tight:
+                grid_rows = grid_cols = grid_min
+            else:
+                grid_rows = random.randint(grid_min, grid_max)
+                grid_cols = random.randint(grid_min, grid_max)
 
             preview_frame = frame
             if preview and cv2 is not None:
-                preview_frame = frame.copy()
-                overlay_grid(cv2, preview_frame, grid_rows, grid_cols)
-                try:
-                    cv2.imshow(window, preview_frame)
-                    if cv2.waitKey(1) & 0xFF == ord("q"):
-                        print("[entropy-1.11] Preview cerrado por el usuario")
-                        break
-                except Exception:
-                    pass
-
-            grid = grid_from_bgr_array(frame, cols=grid_cols, rows=grid_rows)
-            flat = flatten_grid(grid)
-            resolution = (frame.shape[1], frame.shape[0])
-            luminance = (
-                0.299 * frame[:, :, 2] + 0.587 * frame[:, :, 1] + 0.114 * frame[:, :, 0]
-            ).mean()
+                with deadline.stage("preview"):
+                    if not tight:
+                        preview_frame = frame.copy()
+                        overlay_grid(cv2, preview_frame, grid_rows, grid_cols)
+                    try:
+                        cv2.imshow(window, preview_frame)
+                        if cv2.waitKey(1) & 0xFF == ord("q"):
+                            print("[entropy-1.11] Preview cerrado por el usuario")
+                            break
+                    except Exception:
+                        pass
+
+            with deadline.stage("grid"):
+                grid = grid_from_bgr_array(frame, cols=grid_cols, rows=grid_rows)
+                flat = flatten_grid(grid)
+                resolution = (frame.shape[1], frame.shape[0])
+                luminance = (
+                    0.299 * frame[:, :, 2] + 0.587 * frame[:, :, 1] + 0.114 * frame[:, :, 0]
+                ).mean()
 
             opener.logger.write(
                 f"FRAME index={i} grid_rows={grid_rows} grid_cols={grid_cols} brightness={luminance:.2f}"
+                f" tight={tight}"
             )
 
             collected.append(
@@ -297,8 +356,14 @@ def capture_frames(
                 f" brillo promedio {luminance:.1f})."
             )
 
+            frame_cost = max(frame_cost, time.monotonic() - frame_start)
+
             if i < frames - 1:
-                time.sleep(max(0.0, interval))
+                with deadline.stage("interval"):
+                    wait = deadline.clamp(max(0.0, interval))
+                    if tight:
+                        wait = 0.0
+                    time.sleep(wait)
     finally:
         opener._release(cap)
         if preview and cv2 is not None:
@@ -313,6 +378,106 @@ def capture_frames(
     return collected
 
 
+def camera_entropy_source(
+    opener: CameraOpener,
+    index: int,
+    *,
+    timeout: float,
+    grid_min: int,
+    grid_max: int,
+    deadline: Optional[Deadline] = None,
+) -> EntropySource:
+    """Fuente para el mezclador que lee un único frame de la cámara ``index``."""
+
+    def fetch() -> bytes:
+        cap, _, _ = opener.open_camera(
+            preferred_index=index, try_all=False, retries=1, delay=0.0, deadline=deadline
+        )
+        try:
+            ok, frame = opener.read_frame(cap, timeout=timeout, deadline=deadline)
+        finally:
+            opener._release(cap)
+        if not ok or frame is None:
+            raise RuntimeError(f"No se pudo leer un frame de la cámara {index}")
+        rows = random.randint(grid_min, grid_max)
+        cols = random.randint(grid_min, grid_max)
+        grid = grid_from_bgr_array(frame, cols=cols, rows=rows)
+        return bytes(value & 0xFF for value in flatten_grid(grid))
+
+    return EntropySource(name=f"camera:{index}", fetch=fetch)
+
+
+def mix_with_capture(
+    args: argparse.Namespace,
+    run_capture: Callable[[], List[FrameData]],
+    *,
+    opener: CameraOpener,
+    logger: SimpleLogger,
+    grid_min: int,
+    grid_max: int,
+    deadline: Deadline,
+) -> Tuple[List[FrameData], bytes]:
+    """Ejecuta la captura principal junto con las fuentes extra del mezclador.
+
+    La captura corre en el hilo principal (la ventana de preview lo necesita)
+    mientras las cámaras y archivos extra y ``os.urandom`` corren en el pool;
+    la mezcla termina cuando la captura y ``--mix-min-sources`` fuentes (por
+    defecto todas) están listas.
+    """
+
+    captured: Dict[str, Any] = {}
+
+    def fetch_capture() -> bytes:
+        try:
+            frames = run_capture()
+        except Exception as exc:
+            captured["error"] = exc
+            raise
+        captured["frames"] = frames
+        captured["done"] = time.monotonic()
+        return b"".join(bytes(value & 0xFF for value in frame.flat) for frame in frames)
+
+    sources = [
+        EntropySource(name="camera:primary", fetch=fetch_capture, required=True, inline=True),
+        os_random_source(),
+    ]
+    sources.extend(
+        camera_entropy_source(
+            opener,
+            index,
+            timeout=max(0.1, args.timeout),
+            grid_min=grid_min,
+            grid_max=grid_max,
+            deadline=deadline,
+        )
+        for index in args.mix_camera
+    )
+    sources.extend(file_source(path) for path in args.mix_file)
+    mixer = EntropyMixer(
+        sources,
+        min_sources=(
+            len(sources)
+            if args.mix_min_sources is None
+            else min(len(sources), max(1, args.mix_min_sources))
+        ),
+        logger=logger,
+    )
+    mixed = mixer.mix(deadline=deadline)
+    if "error" in captured:
+        raise captured["error"]
+    # Sólo cuenta como "mix" la espera posterior a la captura principal
+    deadline.mark("mix", captured["done"])
+
+    for stat in mixed.stats:
+        if not stat.ok:
+            print(f"[entropy-1.11][WARN] Fuente {stat.name} descartada ({stat.error}).")
+    if not mixed.sufficient:
+        print("[entropy-1.11][WARN] No todas las fuentes extra respondieron a tiempo.")
+    if args.diag:
+        print(f"[entropy-1.11][diag] Mezcla: {mixed.summary()}")
+    return captured["frames"], mixed.digest
+
+
 def overlay_grid(cv2_module, frame: Any, rows: int, cols: int) -> None:
     """Dibuja una cuadrícula con estadísticas de color por celda."""
 
@@ -420,6 +585,16 @@ def prompt_password_length(min_length: int, max_length: int) -> int:
         print(f"Ingresa un valor entre {min_length} y {max_length}.")
 
 
+def positive_float(raw: str) -> float:
+    try:
+        value = float(raw)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{raw}' no es un número válido")
+    if not value > 0:
+        raise argparse.ArgumentTypeError("el valor debe ser un número positivo")
+    return value
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="entropy-password-1.11",
@@ -444,7 +619,47 @@ def build_parser() -> argparse.ArgumentParser:
         default=12,
         help="Tamaño máximo de la cuadrícula dinámica",
     )
+    parser.add_argument(
+        "--deadline",
+        type=positive_float,
+        default=None,
+        help="Presupuesto total en segundos para abrir la cámara, capturar y generar la contraseña",
+    )
+    parser.add_argument(
+        "--mix-camera",
+        type=int,
+        action="append",
+        default=[],
+        help=(
+            "Índice de cámara adicional a mezclar en paralelo (se puede repetir); debe ser"
+            " distinto de --preferred-index y la captura principal no lo probará al buscar otras cámaras"
+        ),
+    )
+    parser.add_argument(
+        "--mix-file",
+        action="append",
+        default=[],
+        help="Archivo (respaldo JSON o bytes crudos) a mezclar como fuente extra (se puede repetir)",
+    )
+    parser.add_argument(
+        "--mix-min-sources",
+        type=int,
+        default=None,
+        help=(
+            "Fuentes que deben terminar antes de dejar de esperar al resto"
+            " (cuentan la captura principal y os.urandom; por defecto, todas)"
+        ),
+    )
     parser.add_argument("--out-json", default=None, help="Ruta para escribir el JSON de respaldo")
+    parser.add_argument(
+        "--profile",
+        default=None,
+        metavar="RUTA",
+        help=(
+            "Perfilar la ejecución con cProfile y guardar el resultado (pstats) y un resumen .txt;"
+            " sólo se perfila el hilo principal, no los hilos del mezclador (--mix-camera/--mix-file)"
+        ),
+    )
     parser.add_argument("--diag", action="store_true", help="Modo diagnóstico para ver errores detallados")
     parser.add_argument(
         "--preferred-index", type=int, default=0, help="Índice primario de cámara antes de probar otros"
@@ -471,10 +686,54 @@ def build_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def write_profile(path: str, profiler: cProfile.Profile, deadline: Deadline) -> None:
+    """Guarda las estadísticas de cProfile y un resumen legible con los tiempos por etapa."""
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)) or ".", exist_ok=True)
+    profiler.dump_stats(path)
+    buffer = io.StringIO()
+    stats = pstats.Stats(profiler, stream=buffer)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(40)
+    with open(f"{path}.txt", "w", encoding="utf-8") as handle:
+        handle.write("# Tiempos por etapa (segundos)\n")
+        for name, seconds in deadline.stages.items():
+            handle.write(f"{name}\t{seconds:.6f}\n")
+        handle.write(f"total\t{deadline.elapsed():.6f}\n\n")
+        handle.write(buffer.getvalue())
+
+
 def main(argv: Optional[Sequence[str]] = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
+    if args.preferred_index in args.mix_camera:
+        parser.error(
+            f"--mix-camera {args.preferred_index} coincide con --preferred-index:"
+            " la misma cámara no puede abrirse dos veces a la vez"
+        )
+    deadline = Deadline(args.deadline)
+
+    if not args.profile:
+        return _run(args, deadline)
+
+    # _run activa el perfil junto con deadline.start(), tras las preguntas al usuario
+    profiler = cProfile.Profile()
+    try:
+        return _run(args, deadline, profiler)
+    finally:
+        profiler.disable()
+        if not profiler.getstats():
+            print("[entropy-1.11] No se generó perfil: la captura no llegó a iniciarse.")
+        else:
+            try:
+                write_profile(args.profile, profiler, deadline)
+                print(f"[entropy-1.11] Perfil guardado en {args.profile} (resumen en {args.profile}.txt)")
+            except Exception as exc:
+                print(f"[entropy-1.11][WARN] No se pudo escribir el perfil: {exc}")
+
 
+def _run(
+    args: argparse.Namespace, deadline: Deadline, profiler: Optional[cProfile.Profile] = None
+) -> int:
     if not prompt_open_camera():
         print("[entropy-1.11] Operación cancelada por el usuario.")
         return 1
@@ -496,9 +755,12 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
 
     logger = get_logger()
     opener = CameraOpener(logger=logger)
+    deadline.start()
+    if profiler is not None:
+        profiler.enable()
 
-    try:
-        frame_data = capture_frames(
+    def run_capture() -> List[FrameData]:
+        return capture_frames(
             opener=opener,
             frames=frames_to_capture,
             interval=max(0.0, args.interval),
@@ -513,22 +775,47 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
                 "retries": args.retries,
                 "delay": args.delay,
                 "diag": args.diag,
+                # Los índices de --mix-camera los abre el mezclador en paralelo
+                "exclude": tuple(args.mix_camera),
             },
+            deadline=deadline,
         )
+
+    extra_entropy = b""
+    try:
+        if args.mix_camera or args.mix_file:
+            frame_data, extra_entropy = mix_with_capture(
+                args,
+                run_capture,
+                opener=opener,
+                logger=logger,
+                grid_min=grid_min,
+                grid_max=grid_max,
+                deadline=deadline,
+            )
+        else:
+            frame_data = run_capture()
     except Exception as exc:
+        logger.write(f"TIMING {deadline.report()}")
         print(f"[entropy-1.11][ERROR] {exc}")
         print(f"[entropy-1.11][INFO] Detalles en {logger.path}")
+        if args.diag:
+            print(f"[entropy-1.11][diag] Tiempos: {deadline.report()}")
         if isinstance(exc, CameraOpenError):
             return 2
+        if isinstance(exc, DeadlineExceeded):
+            return 4
         return 3
 
-    password = generate_password(
-        frame_data,
-        length=password_length,
-        allowed_groups=DEFAULT_GROUPS,
-        required_groups=None,
-        extra_chars="",
-    )
+    with deadline.stage("hash"):
+        password = generate_password(
+            frame_data,
+            length=password_length,
+            allowed_groups=DEFAULT_GROUPS,
+            required_groups=None,
+            extra_chars="",
+            extra_entropy=extra_entropy,
+        )
 
     print("\n=== Entropy Password Version 1.11 ===")
     print(f"Password generada ({len(password)}): {password}")
@@ -536,11 +823,16 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
 
     if args.out_json:
         try:
-            write_json(args.out_json, frame_data, password)
+            with deadline.stage("json"):
+                write_json(args.out_json, frame_data, password)
             print(f"[entropy-1.11] Respaldo JSON guardado en {args.out_json}")
         except Exception as exc:
             print(f"[entropy-1.11][WARN] No se pudo escribir JSON: {exc}")
 
+    logger.write(f"TIMING {deadline.report()}")
+    if args.deadline is not None or args.diag or args.profile:
+        print(f"[entropy-1.11] Tiempos por etapa: {deadline.report()}")
+
     return 0
 if __name__ == "__main__":
     sys.exit(main())
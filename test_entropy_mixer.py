@@ -0,0 +1,150 @@
+"""Pruebas del mezclador con fuentes sintéticas (no requieren cámara)."""
+
+import hashlib
+import threading
+import time
+
+from entropy_mixer import Deadline, EntropyMixer, EntropySource
+
+
+def framed(name: str, data: bytes) -> bytes:
+    raw = name.encode("utf-8")
+    return len(raw).to_bytes(2, "little") + raw + len(data).to_bytes(4, "little") + data
+
+
+def delayed(data: bytes, seconds: float):
+    def fetch() -> bytes:
+        time.sleep(seconds)
+        return data
+
+    return fetch
+
+
+def blocked(release: threading.Event, data: bytes = b"late"):
+    def fetch() -> bytes:
+        release.wait(5)
+        return data
+
+    return fetch
+
+
+def fail() -> bytes:
+    raise OSError("sin cámara")
+
+
+def test_mix_folds_sources_in_completion_order():
+    mixer = EntropyMixer(
+        [
+            EntropySource(name="slow", fetch=delayed(b"bbbb", 0.1)),
+            EntropySource(name="fast", fetch=lambda: b"aa"),
+        ],
+        min_sources=2,
+    )
+    result = mixer.mix()
+
+    assert result.sufficient
+    slow, fast = result.stats
+    assert (fast.name, fast.ok, fast.contributed, fast.order) == ("fast", True, 2, 0)
+    assert (slow.name, slow.ok, slow.contributed, slow.order) == ("slow", True, 4, 1)
+    assert slow.latency >= 0.1 > fast.latency
+    expected = hashlib.sha512(framed("fast", b"aa") + framed("slow", b"bbbb")).digest()
+    assert result.digest == expected
+
+
+def test_mix_stops_when_required_source_fails():
+    release = threading.Event()
+    mixer = EntropyMixer(
+        [
+            EntropySource(name="primary", fetch=fail, required=True),
+            EntropySource(name="straggler", fetch=blocked(release)),
+        ],
+    )
+    try:
+        result = mixer.mix()
+    finally:
+        release.set()
+
+    assert not result.sufficient
+    assert result.elapsed < 1.0
+    primary, straggler = result.stats
+    assert not primary.ok and primary.error.startswith("OSError")
+    assert not straggler.ok and straggler.error == "omitida"
+
+
+def test_mix_omits_sources_when_deadline_expires():
+    release = threading.Event()
+    mixer = EntropyMixer(
+        [
+            EntropySource(name="os", fetch=lambda: b"x" * 32),
+            EntropySource(name="camera", fetch=blocked(release)),
+        ],
+        min_sources=2,
+    )
+    try:
+        result = mixer.mix(deadline=Deadline(0.05))
+    finally:
+        release.set()
+
+    assert not result.sufficient
+    assert result.elapsed < 1.0
+    os_stat, camera = result.stats
+    assert os_stat.ok
+    assert not camera.ok and camera.error == "omitida"
+    assert camera.latency >= 0.04
+
+
+def test_mix_waits_for_min_bytes():
+    sources = [
+        EntropySource(name="a", fetch=lambda: b"1234"),
+        EntropySource(name="b", fetch=delayed(b"5678", 0.05)),
+    ]
+
+    result = EntropyMixer(sources, min_bytes=8).mix()
+    assert result.sufficient
+    assert all(stat.ok for stat in result.stats)
+
+    result = EntropyMixer(sources, min_bytes=100).mix()
+    assert not result.sufficient
+
+
+def test_mix_inline_runs_in_calling_thread_and_stops_when_sufficient():
+    threads = []
+
+    def fetch() -> bytes:
+        threads.append(threading.get_ident())
+        return b"grid"
+
+    mixer = EntropyMixer(
+        [
+            EntropySource(name="grid", fetch=fetch, required=True),
+            EntropySource(name="os", fetch=lambda: b"x" * 32),
+            EntropySource(name="extra", fetch=lambda: b"never"),
+        ],
+        min_sources=2,
+    )
+    result = mixer.mix_inline()
+
+    assert threads == [threading.get_ident()]
+    assert result.sufficient
+    assert [stat.ok for stat in result.stats] == [True, True, False]
+    assert result.stats[2].error == "omitida"
+    expected = hashlib.sha512(framed("grid", b"grid") + framed("os", b"x" * 32)).digest()
+    assert result.digest == expected
+
+
+def test_mix_inline_stops_on_required_failure_and_expired_deadline():
+    mixer = EntropyMixer(
+        [
+            EntropySource(name="primary", fetch=fail, required=True),
+            EntropySource(name="os", fetch=lambda: b"x"),
+        ],
+    )
+    result = mixer.mix_inline()
+    assert not result.sufficient
+    assert result.stats[1].error == "omitida"
+
+    result = EntropyMixer([EntropySource(name="os", fetch=lambda: b"x")]).mix_inline(
+        deadline=Deadline(0)
+    )
+    assert not result.sufficient
+    assert result.stats[0].error == "omitida"